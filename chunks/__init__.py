@@ -8,7 +8,9 @@ submodule. Writing will be added via the chunks.encode submodule.
 
 from chunks.common import (
     Block,
+    BlockColumns,
     Chunk,
+    SurfaceColumns,
     SurfacePoint,
 )
 from chunks.decode import (
@@ -19,7 +21,9 @@ from chunks.decode import (
 
 __all__ = [
     'Block',
+    'BlockColumns',
     'Chunk',
+    'SurfaceColumns',
     'SurfacePoint',
     'ChunksDecoder',
     'Chunks128Decoder',
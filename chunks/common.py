@@ -7,6 +7,11 @@ from collections import namedtuple
 Chunk = namedtuple('Chunk', 'x y blocks surface')
 Block = namedtuple('Block', 'x y z type light state')
 SurfacePoint = namedtuple('SurfacePoint', 'x y elevation temperature humidity')
+# Like Block and SurfacePoint, but each field holds a sequence with a value
+# for every block or surface point. The decoders fill them with arrays from
+# the array module, using the smallest item type that fits each field.
+BlockColumns = namedtuple('BlockColumns', Block._fields)
+SurfaceColumns = namedtuple('SurfaceColumns', SurfacePoint._fields)
 
 
 def extract_bits(n, n_bits, offset_from_lsb):
@@ -23,7 +28,6 @@ def extract_bits(n, n_bits, offset_from_lsb):
     LSB, with the LSB itself having the offset 0.
     """
     try:
-        bitmask = (2**n_bits - 1) << offset_from_lsb
+        return (n >> offset_from_lsb) & ((1 << n_bits) - 1)
     except TypeError as err:
         raise ValueError(err)
-    return (n & bitmask) >> offset_from_lsb
@@ -1,13 +1,239 @@
 #!/usr/bin/python3
 
-"""Decode Survivalcraft chunks files."""
-
+"""Decode Survivalcraft chunks files.
+
+The decoders work on whole chunks at a time, which keeps the work in C under
+CPython (python3). Fields within a byte are gathered with extended slices and
+bytes.translate. Fields crossing byte boundaries, and the chunk position added
+to the coordinate columns, are handled by operating on a whole column as one
+large integer.
+
+PyPy (pypy3) runs the module unchanged. Only Chunks129Decoder.unpack_blocks
+has a separate PyPy implementation, a plain loop over the blocks, which is
+faster there once the JIT has compiled it. Everything else, including the
+1.28 decoder, the coordinate offsets in _LocalCoordinates and _select_items,
+runs the same code as under CPython. No extension modules are needed either
+way.
+"""
+
+import mmap
+import os
+import platform
+import sys
 from abc import ABCMeta, abstractmethod
 from array import array
-from os import SEEK_CUR
+from collections import namedtuple
+from functools import lru_cache
+from itertools import chain
 from struct import Struct
 
-from chunks.common import Block, SurfacePoint, extract_bits
+from chunks.common import (
+    Block,
+    BlockColumns,
+    Chunk,
+    SurfaceColumns,
+    SurfacePoint,
+)
+
+# The largest number of consecutive chunks fetched from a file in one read.
+_MAX_CHUNKS_PER_READ = 64
+# The sizes, in bytes, of the parts of a chunks file, computed per decoder.
+_Layout = namedtuple('_Layout', 'blocks_size surface_size directory_size '
+                                'chunk_size')
+# Whether a tracing JIT compiles plain Python loops, so they beat the
+# big-integer tricks that are fastest under CPython. This only selects the
+# implementation of Chunks129Decoder.unpack_blocks.
+_JIT_COMPILED = platform.python_implementation() == 'PyPy'
+# Translation tables mapping each byte value to its low and high nibble.
+_LOW_NIBBLES = bytes(b & 0xF for b in range(256))
+_HIGH_NIBBLES = bytes(b >> 4 for b in range(256))
+# Translation tables for the second byte of a 1.29 block, which holds the two
+# high bits of the block type and, above them, the light value.
+_LOW_TWO_BITS = bytes(b & 0x3 for b in range(256))
+_MIDDLE_NIBBLES = bytes((b >> 2) & 0xF for b in range(256))
+
+
+def _prefetch(chunksf, offset, size):
+    """Ask the OS to start reading part of chunksf in the background.
+
+    This works for mmap objects and for regular files, on platforms offering
+    madvise or posix_fadvise respectively. It is only a hint, so any failure
+    is silently ignored, e.g. for in-memory files.
+    """
+    try:
+        if isinstance(chunksf, mmap.mmap):
+            start = offset - offset % mmap.PAGESIZE
+            chunksf.madvise(mmap.MADV_WILLNEED, start, offset + size - start)
+        else:
+            os.posix_fadvise(chunksf.fileno(), offset, size,
+                             os.POSIX_FADV_WILLNEED)
+    except (AttributeError, OSError, ValueError):
+        pass
+
+
+def _index_column(size, inner, outer, typecode='q'):
+    """Build one coordinate column of a grid of items as an array.
+
+    Each value in range(size) is repeated inner times in a row, and the
+    resulting sequence is repeated outer times. This matches the coordinate
+    along an axis of a grid stored in row-major order, with inner items per
+    step along the axis and outer steps along the axes before it. Only array
+    repetition is used, so no arithmetic is done per item.
+    """
+    column = array(typecode)
+    for value in range(size):
+        column += array(typecode, [value]) * inner
+    return column * outer
+
+
+@lru_cache(maxsize=None)
+def _repeat_lanes(value, lane_size, lanes):
+    """Return an integer holding a number of copies of value.
+
+    Each copy of value takes up lane_size bytes when the integer is converted
+    to bytes in little-endian order. Results are cached, so decoders for the
+    same format share their masks.
+    """
+    return int.from_bytes(value.to_bytes(lane_size, 'little') * lanes,
+                          'little')
+
+
+def _select_items(data, item_size, index):
+    """Gather the items selected by an index from packed binary data.
+
+    Data is a bytes-like object holding items of item_size bytes each. The
+    index is either a slice with a positive step or a sequence of item
+    indices. The selected items are returned as bytes, packed the same way.
+    For a slice, each byte position within an item is gathered with one
+    extended slice, so there is no loop over the items.
+    """
+    data = bytes(data)
+    if not isinstance(index, slice):
+        return b''.join([data[i*item_size:(i + 1)*item_size] for i in index])
+    start, stop, step = index.indices(len(data) // item_size)
+    selected = bytearray(len(range(start, stop, step)) * item_size)
+    for byte in range(item_size):
+        selected[byte::item_size] = data[start*item_size + byte:
+                                         stop*item_size:step*item_size]
+    return bytes(selected)
+
+
+def _select_column(column, index):
+    """Return the items of an array selected by a slice or index sequence."""
+    if isinstance(index, slice):
+        return column[index]
+    return array(column.typecode, map(column.__getitem__, index))
+
+
+def _bytes_to_array(typecode, data):
+    """Read little-endian items from a bytes-like object into an array."""
+    result = array(typecode)
+    result.frombytes(data)
+    if sys.byteorder != 'little':
+        result.byteswap()
+    return result
+
+
+def _int_to_array(typecode, n, size):
+    """Convert n to size little-endian bytes and read those into an array."""
+    return _bytes_to_array(typecode, n.to_bytes(size, 'little'))
+
+
+def _split_nibbles(data):
+    """Split each byte of data into its nibbles, returning two byte arrays.
+
+    The first array holds the low and the second one the high nibbles. Both
+    are produced by a single bytes.translate call each. This is more than
+    twice as fast as masking all bytes at once as lanes of one large integer,
+    which is only worth it for fields that cross byte boundaries.
+    """
+    return (array('B', data.translate(_LOW_NIBBLES)),
+            array('B', data.translate(_HIGH_NIBBLES)))
+
+
+def _unpack_fields_pure(data, typecode, fields):
+    """Extract bit fields from an array of integers using a plain loop.
+
+    Data holds little-endian integers of the array type typecode, and fields
+    is a sequence of (typecode, shift, mask) tuples. An array of the given
+    type holding the values of each field is returned for every item of
+    fields. The output arrays are allocated up front and filled in place, and
+    only local names are used in the loop, so PyPy's JIT can compile it to
+    machine code.
+    """
+    values = _bytes_to_array(typecode, data)
+    columns = []
+    for field_type, shift, mask in fields:
+        column = array(field_type, [0]) * len(values)
+        for i, value in enumerate(values):
+            column[i] = (value >> shift) & mask
+        columns.append(column)
+    return tuple(columns)
+
+
+def _array_to_int(column):
+    """Read the contents of an array as one little-endian integer."""
+    if sys.byteorder != 'little':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return int.from_bytes(column.tobytes(), 'little')
+
+
+class _LocalCoordinates:
+    """Coordinate columns for the items of a chunk, relative to the chunk.
+
+    Each column is kept as one integer with a lane per item, so the chunk's
+    position can be added to every item with a single addition (SIMD within a
+    register) instead of a Python loop over the column. Chunk positions are
+    unsigned 32-bit integers in all file formats, so the x and y columns use
+    64-bit lanes, which hold any resulting coordinate exactly, and no lane
+    ever carries into the next one. Columns that are never offset, like z,
+    can use a small array type.
+    """
+
+    def __init__(self, *columns):
+        """Initialise from arrays of equal length."""
+        self.arrays = columns
+        self.columns = tuple(map(_array_to_int, columns))
+        self.ones = tuple(_repeat_lanes(1, column.itemsize, len(column))
+                          for column in columns)
+
+    def offset(self, *offsets):
+        """Return the columns as arrays, each offset by the given amount.
+
+        Columns that no offset is given for are returned unchanged. Those,
+        and columns offset by zero, are copied from the original arrays
+        without any arithmetic.
+        """
+        offsets += (0,) * (len(self.columns) - len(offsets))
+        return tuple(
+            _int_to_array(values.typecode, column + offset*ones,
+                          len(values) * values.itemsize)
+            if offset else values[:]
+            for values, column, ones, offset in zip(
+                self.arrays, self.columns, self.ones, offsets))
+
+
+@lru_cache(maxsize=None)
+def _chunk_coordinates(width, height, depth):
+    """Build the coordinate columns for the items of a chunk of a given size.
+
+    This returns a 2-tuple of _LocalCoordinates objects, for the blocks and
+    the surface points respectively. The result is cached, so all decoders
+    share the same columns.
+    """
+    return (
+        _LocalCoordinates(
+            _index_column(width, height * depth, 1),
+            _index_column(height, depth, width),
+            # Heights are never offset and always fit into a byte.
+            _index_column(depth, 1, width * height, 'B'),
+        ),
+        _LocalCoordinates(
+            _index_column(width, height, 1),
+            _index_column(height, 1, width),
+        ),
+    )
 
 
 class ChunksDecoder(metaclass=ABCMeta):
@@ -21,9 +247,11 @@ class ChunksDecoder(metaclass=ABCMeta):
     correspond to the up/down direction in the game), and CHUNK_DEPTH to the z
     direction.
 
-    Subclasses must override the parse_block, parse_surface_point and
-    offset_from_index methods to get a complete decoder. Other methods should
-    not need to be overridden.
+    Subclasses must override the unpack_blocks and offset_from_index methods
+    to get a complete decoder. unpack_blocks and unpack_surface decode a whole
+    chunk's blocks or surface at once, and every read_* method gets its data
+    from them, so they are the methods to override to process custom data.
+    Other methods should not need to be overridden.
 
     Values for MAGIC, INVALID_INDEX_VALUE, SUPPORTED_VERSIONS, FILE_NAME and
     the *_struct members must be provided in subclasses. Those members are
@@ -53,12 +281,12 @@ class ChunksDecoder(metaclass=ABCMeta):
 
     _{chunk_header, block, surface_point, direntry}_struct:
     The struct.Struct instances that define the arrangement of fields for a
-    chunk's header, a block, and a surface point respectively when read from
-    the file. The tuple resulting from unpacking the Struct from the chunks
-    file is passed directly to the parse_* methods as the data parameter. These
-    structs must be overridden in subclasses. Subclasses should also override
-    the parse_* methods to process the data gathered from unpacking these
-    Structs.
+    chunk's header, a block, a surface point and a directory entry
+    respectively when read from the file. Their sizes determine where each
+    section of a chunk lies. These structs must be overridden in subclasses.
+    The tuple resulting from unpacking a single block or surface point with
+    them can be passed to the parse_* methods, which decode one item at a
+    time. The read_* methods do not use the parse_* methods.
     """
 
     # width: x, height: y, depth: z; (x, y) are horizontal plane
@@ -67,28 +295,45 @@ class ChunksDecoder(metaclass=ABCMeta):
         _chunk_header_struct = _block_struct = _surface_point_struct = \
         _direntry_struct = NotImplemented
 
+    def __init__(self):
+        """Initialise a new decoder.
+
+        This precomputes the coordinates of every block and surface point
+        inside a chunk, so they only need to be offset by the chunk's position
+        when decoding.
+        """
+        w, h, d = self.CHUNK_WIDTH, self.CHUNK_HEIGHT, self.CHUNK_DEPTH
+        blocks_size = w * h * d * self._block_struct.size
+        surface_size = w * h * self._surface_point_struct.size
+        self._layout = _Layout(
+            blocks_size=blocks_size,
+            surface_size=surface_size,
+            directory_size=self._direntry_struct.size * (64*1024 + 1),
+            chunk_size=(self._chunk_header_struct.size +
+                        blocks_size + surface_size),
+        )
+        self._local_block_coordinates, self._local_surface_coordinates = \
+            _chunk_coordinates(w, h, d)
+
     @property
     def blocks_size(self):
-        """Calculate the size, in bytes, of one chunk's blocks in the file."""
-        return (self.CHUNK_WIDTH * self.CHUNK_HEIGHT * self.CHUNK_DEPTH *
-                self._block_struct.size)
+        """The size, in bytes, of one chunk's blocks in the file."""
+        return self._layout.blocks_size
 
     @property
     def surface_size(self):
-        """Calculate the file size, in bytes, of a chunk's surface data."""
-        return (self.CHUNK_WIDTH * self.CHUNK_HEIGHT *
-                self._surface_point_struct.size)
+        """The file size, in bytes, of a chunk's surface data."""
+        return self._layout.surface_size
 
     @property
     def directory_size(self):
-        """Calculate the size, in bytes, of the file's chunk directory."""
-        return self._direntry_struct.size * (64*1024 + 1)
+        """The size, in bytes, of the file's chunk directory."""
+        return self._layout.directory_size
 
     @property
     def chunk_size(self):
-        """Calculate the size, in bytes, of one chunk saved in the file."""
-        return (self._chunk_header_struct.size +
-                self.blocks_size + self.surface_size)
+        """The size, in bytes, of one chunk saved in the file."""
+        return self._layout.chunk_size
 
     @abstractmethod
     def offset_from_index(self, index):
@@ -99,6 +344,15 @@ class ChunksDecoder(metaclass=ABCMeta):
         """
         raise NotImplementedError
 
+    def offsets_from_indices(self, indices):
+        """Calculate the file offsets of chunks from an iterable of indices.
+
+        This returns an iterable of offsets in the same order as indices. By
+        default, offset_from_index is called for each index, but subclasses
+        may override this method with a faster equivalent.
+        """
+        return map(self.offset_from_index, indices)
+
     def _assert_magic(self, actual_magic):
         """Throw a ValueError if the given magic does not match self.MAGIC."""
         if actual_magic != self.MAGIC:
@@ -110,65 +364,225 @@ class ChunksDecoder(metaclass=ABCMeta):
         """Parse the chunk directory and return an array of offsets.
 
         The offsets specify where individual chunks may be found in the file.
-
-        The chunk directory is read from the file object chkf. It is assumed
-        that the file object is opened at the beginning of the directory. After
-        reading the directory, the file object will not be closed, but it will
-        have been advanced by self.directory_size bytes.
+        They are sorted in ascending order, so that visiting them in turn
+        reads the file sequentially. Each chunk's position in the world is
+        stored in its header, so the directory order carries no information.
+
+        The chunk directory is read from the file object chkf, which is first
+        rewound to the start of the file. After reading the directory, the file
+        object will not be closed, but it will be positioned just past the
+        directory. Unused entries are dropped without ever being unpacked
+        individually.
         """
         chkf.seek(0)
-        return array('i', (
-            self.offset_from_index(index)
-            for index, in self._direntry_struct.iter_unpack(
-                chkf.read(self.directory_size))
-            if index != self.INVALID_INDEX_VALUE
-        ))
-
-    def _read_section(self, chunksf, item_struct, parse_function, skip_size,
-                      read_size, directory=None):
+        # Every directory entry ends in the 32-bit index field, so the whole
+        # directory is read as one array and every entry's last item is taken.
+        entries = array('i')
+        entries.frombytes(chkf.read(self.directory_size))
+        if sys.byteorder != 'little':
+            entries.byteswap()
+        step = self._direntry_struct.size // entries.itemsize
+        indices = filter(self.INVALID_INDEX_VALUE.__ne__,
+                         entries[step - 1::step])
+        # Offsets can exceed 2**31 in large 1.29 files, so use 64-bit items.
+        return array('q', sorted(self.offsets_from_indices(indices)))
+
+    def _contiguous_runs(self, directory):
+        """Group chunk offsets into runs of chunks stored back to back.
+
+        This yields (offset, count) tuples, where offset is the position of
+        the first chunk of a run in the file and count is the number of
+        chunks in the run. Runs are ordered by their position in the file and
+        are at most _MAX_CHUNKS_PER_READ chunks long. The directory need not
+        be sorted, but sorting one returned by read_directory is cheap.
+        """
+        chunk_size = self._layout.chunk_size
+        run_start, run_length = None, 0
+        for offset in sorted(directory):
+            if (run_length and run_length < _MAX_CHUNKS_PER_READ and
+                    offset == run_start + run_length*chunk_size):
+                run_length += 1
+                continue
+            if run_length:
+                yield run_start, run_length
+            run_start, run_length = offset, 1
+        if run_length:
+            yield run_start, run_length
+
+    def _read_section(self, chunksf, skip_size, read_size, directory=None):
+        """Read one section of each chunk, yielding (x, y, data) tuples.
+
+        The x and y values are the chunk coordinates from the chunk's header.
+        The data is a bytes-like object holding the raw section, which is
+        assumed to start skip_size bytes after the header and be read_size
+        bytes long.
+
+        Chunks are visited in the order they are stored in the file, not in
+        directory order, and chunks stored back to back are fetched with a
+        single read, so that the file is scanned sequentially. While a run of
+        chunks is being decoded, the OS is asked to fetch the next one, so
+        that reading from disk overlaps with decoding.
+
+        If the file ends part of the way through a chunk, the complete chunks
+        before it are yielded, then a ValueError is raised.
+        """
         if directory is None:
             directory = self.read_directory(chunksf)
-        for offset in directory:
-            chunksf.seek(offset)
-            magic, chunk_x, chunk_y = self._chunk_header_struct.unpack(
-                chunksf.read(self._chunk_header_struct.size))
-            self._assert_magic(magic)
-            if skip_size:
-                chunksf.seek(skip_size, SEEK_CUR)
-            yield from (
-                parse_function(i, chunk_x, chunk_y, data)
-                for i, data in enumerate(item_struct.iter_unpack(
-                    chunksf.read(read_size)))
-            )
+        # Everything used per chunk is bound to a local name up front.
+        unpack_header = self._chunk_header_struct.unpack_from
+        expected_magic, chunk_size = self.MAGIC, self._layout.chunk_size
+        start = self._chunk_header_struct.size + skip_size
+        runs = list(self._contiguous_runs(directory))
+        for run_index, (run_offset, run_length) in enumerate(runs):
+            if run_index + 1 < len(runs):
+                next_offset, next_length = runs[run_index + 1]
+                _prefetch(chunksf, next_offset, next_length * chunk_size)
+            chunksf.seek(run_offset)
+            run = memoryview(chunksf.read(run_length * chunk_size))
+            complete_size = len(run) - len(run) % chunk_size
+            for offset in range(0, complete_size, chunk_size):
+                magic, chunk_x, chunk_y = unpack_header(run, offset)
+                if magic != expected_magic:
+                    self._assert_magic(magic)
+                yield (chunk_x, chunk_y,
+                       run[offset + start:offset + start + read_size])
+            if len(run) < run_length * chunk_size:
+                raise ValueError('truncated chunks file: the chunk at offset '
+                                 '{} ends past the end of the file'
+                                 .format(run_offset + complete_size))
+
+    def _block_coordinates(self, chunk_x, chunk_y):
+        """Calculate the x, y and z columns for the blocks of one chunk."""
+        return self._local_block_coordinates.offset(
+            chunk_x * self.CHUNK_WIDTH, chunk_y * self.CHUNK_HEIGHT)
+
+    def _surface_coordinates(self, chunk_x, chunk_y):
+        """Calculate the x and y columns for the surface of one chunk."""
+        return self._local_surface_coordinates.offset(
+            chunk_x * self.CHUNK_WIDTH, chunk_y * self.CHUNK_HEIGHT)
+
+    def read_block_columns(self, chunksf, directory=None, index=None):
+        """Read the block data from the chunks file, one chunk at a time.
+
+        This yields a BlockColumns object for each chunk, holding one array
+        per Block field, in the order the blocks are stored in the file. The
+        type, light and state columns are produced by the ChunksDecoder
+        subclass's unpack_blocks method, which decodes a whole chunk's blocks
+        at once.
+
+        If index is given, it must be a slice with a positive step or a
+        sequence of block indices. Only the blocks it selects from each chunk
+        are decoded and returned, e.g. slice(z, None, CHUNK_DEPTH) selects the
+        blocks at height z.
+        """
+        for chunk_x, chunk_y, data in self._read_section(
+                chunksf, 0, self.blocks_size, directory):
+            yield self._block_columns(chunk_x, chunk_y, data, index)
+
+    def _block_columns(self, chunk_x, chunk_y, data, index=None):
+        """Decode the blocks of one chunk, or those selected by index."""
+        coordinates = self._block_coordinates(chunk_x, chunk_y)
+        if index is not None:
+            coordinates = [_select_column(column, index)
+                           for column in coordinates]
+            data = _select_items(data, self._block_struct.size, index)
+        return BlockColumns(*coordinates, *self.unpack_blocks(data))
 
     def read_blocks(self, chunksf, directory=None):
         """Read the block data from the chunks file.
 
-        This calls the ChunksDecoder subclass's parse_block method to process
-        each block. You probably want to override it to process custom data.
-        See the parse_block docstring for more information.
+        This yields a Block object for every block in the file. It is a
+        convenience wrapper around read_block_columns, which should be
+        preferred when a lot of blocks are processed.
         """
-        yield from self._read_section(chunksf, self._block_struct,
-                                      self.parse_block, 0, self.blocks_size,
-                                      directory)
+        # Chaining C-level iterators avoids resuming a Python generator frame
+        # and looking up Block._make for every block.
+        return map(Block._make, chain.from_iterable(
+            zip(*columns)
+            for columns in self.read_block_columns(chunksf, directory)))
+
+    def read_surface_columns(self, chunksf, directory=None):
+        """Read the surface data from the chunks file, one chunk at a time.
+
+        This yields a SurfaceColumns object for each chunk, holding one array
+        per SurfacePoint field, in the order the surface points are stored in
+        the file. The elevation, temperature and humidity columns are produced
+        by the unpack_surface method.
+        """
+        for chunk_x, chunk_y, data in self._read_section(
+                chunksf, self.blocks_size, self.surface_size, directory):
+            yield SurfaceColumns(*self._surface_coordinates(chunk_x, chunk_y),
+                                 *self.unpack_surface(data))
 
     def read_surface(self, chunksf, directory=None):
         """Read the surface data from the chunks file.
 
-        This calls the ChunksDecoder subclass's parse_surface_point method to
-        process each point on the world's surface. You probably want to
-        override it to process custom data. See the parse_surface_point
-        docstring for more information.
+        This yields a SurfacePoint object for every point on the world's
+        surface. It is a convenience wrapper around read_surface_columns.
+        """
+        return map(SurfacePoint._make, chain.from_iterable(
+            zip(*columns)
+            for columns in self.read_surface_columns(chunksf, directory)))
+
+    def read_chunks(self, chunksf, directory=None, select_blocks=None):
+        """Read the block and surface data from the chunks file together.
+
+        This yields a Chunk object for each chunk, whose blocks and surface
+        members are BlockColumns and SurfaceColumns objects like those yielded
+        by read_block_columns and read_surface_columns. Both sections of a
+        chunk are taken from the same read, so this is cheaper than reading
+        blocks and surface separately when both are needed.
+
+        If select_blocks is given, it is called with each chunk's
+        SurfaceColumns and must return an index as accepted by
+        read_block_columns. Only the blocks selected by it are decoded.
         """
-        yield from self._read_section(chunksf, self._surface_point_struct,
-                                      self.parse_surface_point,
-                                      self.blocks_size, self.surface_size,
-                                      directory)
+        blocks_size = self.blocks_size
+        for chunk_x, chunk_y, data in self._read_section(
+                chunksf, 0, blocks_size + self.surface_size, directory):
+            surface = SurfaceColumns(
+                *self._surface_coordinates(chunk_x, chunk_y),
+                *self.unpack_surface(data[blocks_size:]))
+            index = None if select_blocks is None else select_blocks(surface)
+            blocks = self._block_columns(chunk_x, chunk_y, data[:blocks_size],
+                                         index)
+            yield Chunk(chunk_x, chunk_y, blocks, surface)
+
+    def unpack_surface(self, data):
+        """Decode the raw surface data of one chunk into columns.
+
+        The data argument is a bytes-like object holding a chunk's surface
+        section. This returns a 3-tuple of arrays holding the elevation,
+        temperature and humidity of every surface point in the chunk.
+
+        All supported file formats store a surface point as an elevation byte
+        followed by a byte holding the temperature in its low and the humidity
+        in its high nibble, padded to the size of _surface_point_struct.
+        Decoders for other layouts must override this method.
+        """
+        data = bytes(data)
+        step = self._surface_point_struct.size
+        return (array('B', data[0::step]), *_split_nibbles(data[1::step]))
 
     @abstractmethod
+    def unpack_blocks(self, data):
+        """Decode the raw block data of one chunk into columns.
+
+        The data argument is a bytes-like object holding a chunk's blocks
+        section, or only the blocks selected by an index. This method must
+        return a 3-tuple of sequences holding the type, light and state values
+        of every block in data, in the order the blocks are stored in the
+        file.
+        """
+        raise NotImplementedError
+
     def parse_block(self, i, chunk_x, chunk_y, data):
         """Parse block data, returning a Block object.
 
+        This decodes a single block, e.g. one unpacked with _block_struct. The
+        read_* methods decode whole chunks with unpack_blocks instead, so
+        overriding this method does not change what they return.
+
         This method of the base decoder class does not process the data tuple.
         It is assumed to be a 3-tuple of (type, light, state) values to pass to
         the Block constructor.
@@ -185,10 +599,14 @@ class ChunksDecoder(metaclass=ABCMeta):
         w, h, d = self.CHUNK_WIDTH, self.CHUNK_HEIGHT, self.CHUNK_DEPTH
         return Block(i//h//d + chunk_x*w, (i//d) % w + chunk_y*h, i % d, *data)
 
-    @abstractmethod
     def parse_surface_point(self, i, chunk_x, chunk_y, data):
         """Parse surface data, returning a SurfacePoint object.
 
+        This decodes a single surface point, e.g. one unpacked with
+        _surface_point_struct. The read_* methods decode whole chunks with
+        unpack_surface instead, so overriding this method does not change what
+        they return.
+
         This method of the base decoder class does not process the data tuple.
         It is assumed to be a 3-tuple of (elevation, temperature, humidity)
         values to pass to the SurfacePoint constructor.
@@ -221,22 +639,37 @@ class Chunks128Decoder(ChunksDecoder):
         """
         return offset
 
+    def offsets_from_indices(self, indices):
+        """Calculate the file offsets of chunks from an iterable of indices.
+
+        As the directory already holds offsets, indices is returned as is.
+        """
+        return indices
+
     def parse_block(self, i, chunk_x, chunk_y, data):
         """Parse block data, returning a Block object."""
         block_type, block_data = data
         return super().parse_block(i, chunk_x, chunk_y, (
-            block_type,
-            extract_bits(block_data, 4, 0),
-            extract_bits(block_data, 4, 4)
+            block_type, block_data & 0xF, block_data >> 4
         ))
 
     def parse_surface_point(self, i, chunk_x, chunk_y, data):
         """Parse surface point data, returning a SurfacePoint object."""
         elevation, climate = data
         return super().parse_surface_point(i, chunk_x, chunk_y, (
-            elevation, extract_bits(climate, 4, 0), extract_bits(climate, 4, 4)
+            elevation, climate & 0xF, climate >> 4
         ))
 
+    def unpack_blocks(self, data):
+        """Decode the raw block data of one chunk into columns.
+
+        Every block is stored as a type byte followed by a byte holding the
+        light value in its low and the block state in its high nibble.
+        """
+        data = bytes(data)
+        step = self._block_struct.size
+        return (array('B', data[0::step]), *_split_nibbles(data[1::step]))
+
 
 class Chunks129Decoder(ChunksDecoder):
     """Decoder for Chunks32.dat files from Survivalcraft 1.29 onwards.
@@ -249,6 +682,16 @@ class Chunks129Decoder(ChunksDecoder):
     FILE_NAME, SUPPORTED_VERSIONS = 'Chunks32.dat', ('1.29',)
     _chunk_header_struct, _block_struct, _surface_point_struct, \
         _direntry_struct = map(Struct, ['<QII', '<I', '<BB2x', '<8xi'])
+    # (array typecode, shift, mask) for the type, light and state fields of a
+    # block. Each field is stored in the smallest array type that holds it.
+    _BLOCK_FIELDS = ('H', 0, 0x3FF), ('B', 10, 0xF), ('I', 14, 0x3FFFF)
+
+    def __init__(self):
+        """Initialise a new decoder and the mask used by unpack_blocks."""
+        super().__init__()
+        lanes = self.CHUNK_WIDTH * self.CHUNK_HEIGHT * self.CHUNK_DEPTH
+        self._state_mask = _repeat_lanes(0x3FFFF, self._block_struct.size,
+                                         lanes)
 
     def offset_from_index(self, index):
         """Calculate the file offset of a chunk from its index.
@@ -257,20 +700,61 @@ class Chunks129Decoder(ChunksDecoder):
         of its offset in the file. Therefore, this method transforms the index
         into a file offset, taking directory and chunk size into account.
         """
-        return self.directory_size + index*self.chunk_size
+        return self._layout.directory_size + index*self._layout.chunk_size
+
+    def offsets_from_indices(self, indices):
+        """Calculate the file offsets of chunks from an iterable of indices.
+
+        This does the same as offset_from_index, without a method call and
+        attribute lookups for every index.
+        """
+        start = self._layout.directory_size
+        chunk_size = self._layout.chunk_size
+        return [start + index*chunk_size for index in indices]
 
     def parse_block(self, i, chunk_x, chunk_y, data):
         """Parse block data, returning a Block object."""
         blk, = data
         return super().parse_block(i, chunk_x, chunk_y, (
-            extract_bits(blk, 10, 0),
-            extract_bits(blk, 4, 10),
-            extract_bits(blk, 18, 14)
+            blk & 0x3FF, (blk >> 10) & 0xF, blk >> 14
         ))
 
     def parse_surface_point(self, i, chunk_x, chunk_y, data):
         """Parse surface point data, returning a SurfacePoint object."""
         elevation, climate = data
         return super().parse_surface_point(i, chunk_x, chunk_y, (
-            elevation, extract_bits(climate, 4, 0), extract_bits(climate, 4, 4)
+            elevation, climate & 0xF, climate >> 4
         ))
+
+    # The implementation is picked once here rather than on every call.
+    if _JIT_COMPILED:
+        def unpack_blocks(self, data):
+            """Decode the raw block data of one chunk into columns.
+
+            Under PyPy, a plain loop over the blocks, which the JIT compiles,
+            is faster than the big-integer operations used under CPython.
+            """
+            return _unpack_fields_pure(bytes(data), 'I', self._BLOCK_FIELDS)
+    else:
+        def unpack_blocks(self, data):
+            """Decode the raw block data of one chunk into columns.
+
+            Every block is stored as a little-endian 32-bit integer. The type
+            and light fields lie within the first two bytes of a block, so
+            they are gathered with extended slices and bytes.translate, giving
+            16-bit and 8-bit columns. For the state, the whole section is read
+            as one large integer with a 32-bit lane per block, and the field
+            is extracted from all lanes at once with a single shift and mask
+            (SIMD within a register). This keeps the work inside CPython's C
+            routines.
+            """
+            data = bytes(data)
+            step = self._block_struct.size
+            second_bytes = data[1::step]
+            types = bytearray(2 * len(second_bytes))
+            types[0::2] = data[0::step]
+            types[1::2] = second_bytes.translate(_LOW_TWO_BITS)
+            state = (int.from_bytes(data, 'little') >> 14) & self._state_mask
+            return (_bytes_to_array('H', types),
+                    array('B', second_bytes.translate(_MIDDLE_NIBBLES)),
+                    _int_to_array('I', state, len(data)))
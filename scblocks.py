@@ -5,6 +5,8 @@
 import sys
 import xml.etree.ElementTree as ETree
 from collections import namedtuple
+from itertools import compress, repeat
+from operator import attrgetter, contains, itemgetter
 
 
 ToolPower = namedtuple('ToolPower', 'quarry shovel hack weapon longevity')
@@ -12,24 +14,54 @@ Block = namedtuple('Block', 'id name power resilience blocks_fluid aimable '
                             'light_attenuation light_emission max_stacking '
                             'nutrition')
 
+# The <Block /> attributes holding ToolPower's fields, in the same order.
+_get_power_attributes = itemgetter('QuarryPower', 'ShovelPower', 'HackPower',
+                                   'WeaponPower', 'AverageToolLongevity')
+# The <Block /> attributes holding Block's other fields, in the same order.
+_get_block_attributes = itemgetter('BlockId', 'Name', 'DigResilience',
+                                   'IsFluidBlocker', 'IsAimable',
+                                   'LightAttenuation', 'EmittedLightAmount',
+                                   'MaxStacking', 'NutritionalValue')
+
 
 def read_block_data(filename):
-    """Build Block namedtuples from information in BlocksData.xml."""
-    for child in ETree.parse(filename).getroot():
+    """Build Block namedtuples from information in BlocksData.xml.
+
+    The file is parsed incrementally, and each <Block /> element is removed
+    from the root element as soon as it has been processed instead of
+    building the whole document tree first. Therefore, memory use does not
+    grow with the number of blocks.
+    """
+    depth, root = 0, None
+    for event, child in ETree.iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = child
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue    # Either the root element or something nested deeper.
         if child.tag != 'Block' or len(child):
             raise ValueError('Root element may only contain <Block /> tags.')
-        yield Block(id=int(child.get('BlockId')),
-                    name=child.get('Name'),
-                    power=ToolPower._make(map(float, map(child.get, (
-                        'QuarryPower', 'ShovelPower', 'HackPower',
-                        'WeaponPower', 'AverageToolLongevity')))),
-                    resilience=float(child.get('DigResilience')),
-                    blocks_fluid=child.get('IsFluidBlocker') == 'True',
-                    aimable=child.get('IsAimable') == 'True',
-                    light_attenuation=int(child.get('LightAttenuation')),
-                    light_emission=int(child.get('EmittedLightAmount')),
-                    max_stacking=int(child.get('MaxStacking')),
-                    nutrition=float(child.get('NutritionalValue')))
+        attrs = child.attrib
+        (block_id, name, resilience, blocks_fluid, aimable, light_attenuation,
+         light_emission, max_stacking,
+         nutrition) = _get_block_attributes(attrs)
+        yield Block(id=int(block_id),
+                    name=name,
+                    power=ToolPower._make(map(float,
+                                              _get_power_attributes(attrs))),
+                    resilience=float(resilience),
+                    blocks_fluid=blocks_fluid == 'True',
+                    aimable=aimable == 'True',
+                    light_attenuation=int(light_attenuation),
+                    light_emission=int(light_emission),
+                    max_stacking=int(max_stacking),
+                    nutrition=float(nutrition))
+        # Clearing only the child would leave an empty element behind in the
+        # root for every block.
+        root.clear()
 
 
 def handle_args(custom_args=None):
@@ -49,12 +81,15 @@ def handle_args(custom_args=None):
 def main():
     """The script's main entry point."""
     args = handle_args()
-    blocks = read_block_data(args.filename)
-    matched_blocks = [blk for blk in blocks
-                      if args.block_name.lower() in blk.name.lower()]
+    blocks = tuple(read_block_data(args.filename))
+    # Match against a column of lower-cased names in one pass of C-level map
+    # calls, instead of evaluating a Python expression for every block.
+    names = map(str.lower, map(attrgetter('name'), blocks))
+    matched_blocks = compress(blocks, map(contains, names,
+                                          repeat(args.block_name.lower())))
     for block in matched_blocks:
         print(block.name)
-        for k, v in block._asdict().items():
+        for k, v in zip(block._fields, block):
             print(' '*3, k, '=', v)
 
 
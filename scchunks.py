@@ -3,9 +3,21 @@
 """Decode and encode Survivalcraft's Chunks.dat and Chunks32.dat files."""
 
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from mmap import ACCESS_READ, mmap
+
+try:
+    from mmap import MADV_SEQUENTIAL
+except ImportError:     # Not available on every platform.
+    MADV_SEQUENTIAL = None
 
 from chunks import Block, SurfacePoint, Chunks128Decoder, Chunks129Decoder
 
+# The number of rows worth handing to a worker process at once (-j/--jobs).
+ROWS_PER_BATCH = 16 * 16 * 128
+
 
 def handle_args(decoders, custom_args=None):
     """Parse and return the script's command-line arguments using argparse.
@@ -31,14 +43,132 @@ def handle_args(decoders, custom_args=None):
              'given an integer preceded by "+" or "-", blocks at an offset of '
              "PLANE from the world's elevation are extracted. Does nothing "
              'if surface points are extracted.')
+    add('-j', '--jobs', metavar='N', type=int, default=1,
+        help='Format the CSV output in N worker processes. Default: 1, '
+             'which does all the work in the main process.')
     add('extract_data', choices=('blocks', 'surface'),
         help='The type of data to extract from the chunks file.')
-    return parser.parse_args(custom_args)
+    args = parser.parse_args(custom_args)
+    if args.jobs < 1:
+        parser.error('argument -j/--jobs: must be at least 1')
+    return args
+
+
+def map_file(fileobj):
+    """Memory-map fileobj for reading, returning the mmap object.
+
+    If the file cannot be mapped (for example, because it is a pipe or empty),
+    fileobj is returned unchanged. Both support the seek and read methods the
+    decoders use, but reading from the mmap object does not need a system
+    call each time.
+
+    The decoders visit chunks in the order they are stored in the file, so
+    where supported, the kernel is told to read ahead aggressively.
+    """
+    try:
+        mapped = mmap(fileobj.fileno(), 0, access=ACCESS_READ)
+    except (OSError, ValueError):
+        return fileobj
+    if MADV_SEQUENTIAL is not None:
+        mapped.madvise(MADV_SEQUENTIAL)
+    return mapped
+
+
+def read_block_chunks(decoder, chunks_file, plane=None):
+    """Read blocks from chunks_file, yielding a tuple of columns per chunk.
+
+    Each tuple holds an array for every Block field. If plane is given, the
+    columns only hold the blocks in the x-y-plane it describes, as documented
+    for the -p/--plane argument.
+
+    Blocks are stored with z varying fastest, so the block at height z above
+    the surface point with index j is at index j*CHUNK_DEPTH + z of its
+    chunk's columns. The plane is therefore selected by indexing the columns
+    directly, without testing every block, and only the selected blocks are
+    decoded in the first place. For planes relative to the surface, each
+    chunk's blocks and surface are decoded from the same read, so the file is
+    only scanned once.
+    """
+    depth = decoder.CHUNK_DEPTH
+    if plane and plane.startswith(('+', '-')):
+        rel_offset = int(plane)
+
+        def select_blocks(surface):
+            return [j*depth + z for j, z in enumerate(
+                        elev + rel_offset for elev in surface.elevation)
+                    if 0 <= z < depth]
+
+        for chunk in decoder.read_chunks(chunks_file,
+                                         select_blocks=select_blocks):
+            yield chunk.blocks
+    elif plane:
+        z_coord = int(plane)
+        # No blocks lie outside the chunk's height. Negative starts would
+        # count from the end, and larger ones would wrap around into the next
+        # column of blocks, so those select nothing.
+        index = (slice(z_coord, None, depth) if 0 <= z_coord < depth
+                 else slice(0))
+        yield from decoder.read_block_columns(chunks_file, index=index)
+    else:
+        yield from decoder.read_block_columns(chunks_file)
+
+
+def batch_chunks(chunks, min_rows):
+    """Group tuples of columns into lists holding at least min_rows rows.
+
+    Only the last list may hold fewer rows. This keeps the per-batch overhead
+    low when chunks are small, e.g. because only one plane is extracted.
+    """
+    batch, rows = [], 0
+    for columns in chunks:
+        batch.append(columns)
+        rows += len(columns[0])
+        if rows >= min_rows:
+            yield batch
+            batch, rows = [], 0
+    if batch:
+        yield batch
+
+
+def format_rows(batch):
+    """Format the rows of a list of column tuples as CSV, returning a string.
+
+    Every field of a Block or SurfacePoint is an integer, which csv.writer
+    writes unquoted even with QUOTE_NONNUMERIC. Therefore, all rows of a
+    chunk are formatted with a single %-format operation instead, using a
+    format string repeated once per row, which gives the same output without
+    any per-row Python calls. This is what worker processes run when
+    -j/--jobs is greater than 1.
+    """
+    if not batch:
+        return ''
+    line_format = ','.join(['%d'] * len(batch[0])) + '\r\n'
+    return ''.join(
+        (line_format * len(columns[0])) %
+        tuple(chain.from_iterable(zip(*columns)))
+        for columns in batch)
+
+
+def parallel_map(function, iterable, jobs):
+    """Like map, but call function in up to `jobs' worker processes.
+
+    Results are yielded in order. Unlike ProcessPoolExecutor.map, this only
+    takes a few items per worker from iterable ahead of time, so that memory
+    use stays bounded for large inputs.
+    """
+    with ProcessPoolExecutor(jobs) as pool:
+        pending = deque()
+        for item in iterable:
+            pending.append(pool.submit(function, item))
+            if len(pending) > 2*jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 
 def main():
     """The script's main entry point."""
-    from csv import QUOTE_NONNUMERIC, DictWriter as CSVDictWriter
+    from csv import QUOTE_NONNUMERIC, writer as csv_writer
     from os.path import basename
 
     decoders = Chunks128Decoder, Chunks129Decoder
@@ -50,52 +180,42 @@ def main():
                   '--chunks-file must be passed to enable autodetection.',
                   file=sys.stderr)
             return 2
-        chunks_fname = basename(args.chunks_file)
-        for decoder_type in decoders:
-            if chunks_fname == decoder_type.FILE_NAME:
-                decoder = decoder_type()
-                break
-        else:
+        by_file_name = {d.FILE_NAME: d for d in decoders}
+        decoder_type = by_file_name.get(basename(args.chunks_file))
+        if decoder_type is None:
             print('Could not determine chunks file version automatically.',
                   file=sys.stderr)
             return 2
     else:
-        for decoder_type in decoders:
-            if args.file_version in decoder_type.SUPPORTED_VERSIONS:
-                decoder = decoder_type()
-                break
-        else:
+        by_version = {v: d for d in decoders for v in d.SUPPORTED_VERSIONS}
+        decoder_type = by_version.get(args.file_version)
+        if decoder_type is None:
             print('Survivalcraft version "{}" is not supported.'
                   .format(args.file_version), file=sys.stderr)
             return 1
+    decoder = decoder_type()
 
-    data_type = {'surface': SurfacePoint, 'blocks': Block}[args.extract_data]
-    data_reader = getattr(decoder, 'read_{}'.format(args.extract_data))
     with (open(args.chunks_file, 'rb')
           if args.chunks_file not in (None, '-')
-          else sys.stdin.buffer) as chunks_file, \
+          else sys.stdin.buffer) as chunks_fileobj, \
+         map_file(chunks_fileobj) as chunks_file, \
          (open(args.output_file, 'wt', newline='')
           if args.output_file is not None
           else sys.stdout) as csvfile:
-        if args.plane and args.extract_data == 'blocks':
-            if any(map(args.plane.startswith, '+-')):
-                rel_offset = int(args.plane)
-                directory = decoder.read_directory(chunks_file)
-                offsets = {(x, y): elev + rel_offset
-                           for x, y, elev, *_ in
-                           decoder.read_surface(chunks_file, directory)}
-                data = filter(lambda b: b.z == offsets[(b.x, b.y)],
-                              data_reader(chunks_file, directory))
-            else:
-                z_coord = int(args.plane)
-                data = filter(lambda b: b.z == z_coord,
-                              data_reader(chunks_file))
+        if args.extract_data == 'blocks':
+            fields = Block._fields
+            chunks = read_block_chunks(decoder, chunks_file, args.plane)
+        else:
+            fields = SurfacePoint._fields
+            chunks = decoder.read_surface_columns(chunks_file)
+        csv_writer(csvfile, quoting=QUOTE_NONNUMERIC).writerow(fields)
+        # Columns are formatted a batch at a time straight from the arrays,
+        # without building an object per row.
+        batches = batch_chunks(chunks, ROWS_PER_BATCH)
+        if args.jobs > 1:
+            csvfile.writelines(parallel_map(format_rows, batches, args.jobs))
         else:
-            data = data_reader(chunks_file)
-        csvwriter = CSVDictWriter(csvfile, fieldnames=data_type._fields,
-                                  quoting=QUOTE_NONNUMERIC)
-        csvwriter.writeheader()
-        csvwriter.writerows(map(data_type._asdict, data))
+            csvfile.writelines(map(format_rows, batches))
 
 
 if __name__ == '__main__':
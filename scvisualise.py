@@ -3,18 +3,17 @@
 """Script to visualise CSV data using a heatmap."""
 
 import sys
-from argparse import ArgumentParser
 from collections import namedtuple
-from configparser import ConfigParser, ExtendedInterpolation
-from csv import QUOTE_NONNUMERIC, DictReader as CSVDictReader
-from png import Writer as PNGWriter
+from csv import QUOTE_NONNUMERIC, reader as csv_reader
+from operator import itemgetter
 
-from visualise import (AbsoluteColorMap, DefaultColorMap, HeatmapDataSet,
-                       HeatmapPoint)
+from visualise import AbsoluteColorMap, DefaultColorMap, HeatmapDataSet
 
 
 def handle_args(custom_args=None):
     """Parse and return the script's command-line arguments using argparse."""
+    from argparse import ArgumentParser
+    from configparser import ConfigParser, ExtendedInterpolation
     Args = namedtuple('Args', 'x_column y_column value_column min_value '
                               'max_value output_file data_file color_map')
     parser = ArgumentParser(description='Create heatmaps from values '
@@ -90,29 +89,35 @@ def handle_args(custom_args=None):
 def main():
     """The script's main entry point."""
     args = handle_args()
+    # Imported here, so that --help and argument errors work without pypng.
+    from png import Writer as PNGWriter
     with (open(args.data_file, 'rt')
           if args.data_file not in (None, '-')
           else sys.stdin) as data_file:
-        data_reader = CSVDictReader(data_file, quoting=QUOTE_NONNUMERIC)
-        try:
-            data = HeatmapDataSet(
-                (HeatmapPoint(round(row[args.x_column]),
-                              round(row[args.y_column]),
-                              round(row[args.value_column]))
-                 for row in data_reader),
-                min_value=args.min_value, max_value=args.max_value
-            )
-        except KeyError as err:
-            print('Requested header "{}" was not found in input data. Try '
-                  'specifying -x/-y/-c.'.format(*err.args), file=sys.stderr)
-            return 1
+        data_reader = csv_reader(data_file, quoting=QUOTE_NONNUMERIC)
+        header = next(data_reader, [])
+        columns = args.x_column, args.y_column, args.value_column
+        for column in columns:
+            if column not in header:
+                print('Requested header "{}" was not found in input data. Try '
+                      'specifying -x/-y/-c.'.format(column), file=sys.stderr)
+                return 1
+        # Split the needed fields into columns straight away and round them
+        # with C-level map calls, rather than building an object per row.
+        # Blank lines are read as empty rows, which are skipped.
+        get_fields = itemgetter(*map(header.index, columns))
+        xs, ys, values = (map(round, column) for column in
+                          zip(*map(get_fields, filter(None, data_reader))))
+        data = HeatmapDataSet.from_columns(xs, ys, values,
+                                           min_value=args.min_value,
+                                           max_value=args.max_value)
     colormap = (DefaultColorMap() if args.color_map is None
                 else AbsoluteColorMap(args.color_map))
     writer = PNGWriter(width=data.bounds.width, height=data.bounds.height,
-                       alpha=True)
+                       greyscale=colormap.greyscale, alpha=True)
     with (open(args.output_file, 'wb') if args.output_file is not None
           else sys.stdout.buffer) as outfile:
-        writer.write(outfile, colormap.color_heatmap(data))
+        writer.write_array(outfile, colormap.heatmap_pixels(data))
 
 
 if __name__ == '__main__':
@@ -2,6 +2,8 @@
 
 """Test the chunks module."""
 
+import io
+import struct
 import unittest
 from itertools import product
 
@@ -26,12 +28,187 @@ class BitExtractorTest(unittest.TestCase):
                     chunks.common.extract_bits(i, j, k)
 
 
+class UnpackBlocksTest(unittest.TestCase):
+    """Test the decoders' bulk block and surface unpacking."""
+
+    def test_unpack_blocks_128(self):
+        """Test splitting <=1.28 blocks into type, light and state."""
+        decoder = chunks.Chunks128Decoder()
+        types, lights, states = decoder.unpack_blocks(bytes([7, 0xA3, 0, 0]))
+        self.assertEqual(list(types), [7, 0])
+        self.assertEqual(list(lights), [0x3, 0])
+        self.assertEqual(list(states), [0xA, 0])
+
+    def test_unpack_blocks_129(self):
+        """Test splitting 1.29 blocks into type, light and state."""
+        decoder = chunks.Chunks129Decoder()
+        blk = 0x3FFFF << 14 | 0x5 << 10 | 0x2A7
+        data = struct.pack('<2I', blk, 0)
+        types, lights, states = decoder.unpack_blocks(data)
+        self.assertEqual(list(types), [0x2A7, 0])
+        self.assertEqual(list(lights), [0x5, 0])
+        self.assertEqual(list(states), [0x3FFFF, 0])
+
+    def test_unpack_surface(self):
+        """Test splitting surface points into elevation and climate."""
+        decoder = chunks.Chunks128Decoder()
+        data = bytes([64, 0x3C, 0xFF, 0xFF, 127, 0, 0, 0])
+        elevations, temperatures, humidities = decoder.unpack_surface(data)
+        self.assertEqual(list(elevations), [64, 127])
+        self.assertEqual(list(temperatures), [0xC, 0])
+        self.assertEqual(list(humidities), [0x3, 0])
+
+    def test_unpack_blocks_pure(self):
+        """Check the loop used under PyPy against the default method."""
+        decoder = chunks.Chunks129Decoder()
+        data = bytes(range(256)) * (decoder.blocks_size // 256)
+        self.assertEqual(
+            chunks.decode._unpack_fields_pure(data, 'I',
+                                              decoder._BLOCK_FIELDS),
+            decoder.unpack_blocks(data))
+
+
+class ParseTest(unittest.TestCase):
+    """Test the per-item parse methods against the column readers."""
+
+    def test_parse_block(self):
+        """Check block coordinates calculated by parse_block."""
+        decoder = chunks.Chunks128Decoder()
+        columns = decoder._block_coordinates(3, 5)
+        for i in (0, 127, 128, 2047, 2048, 32767):
+            block = decoder.parse_block(i, 3, 5, (1, 0x21))
+            self.assertEqual(block[:3], tuple(c[i] for c in columns))
+            self.assertEqual(block[3:], (1, 1, 2))
+
+    def test_parse_surface_point(self):
+        """Check surface coordinates calculated by parse_surface_point."""
+        decoder = chunks.Chunks129Decoder()
+        columns = decoder._surface_coordinates(3, 5)
+        for i in (0, 15, 16, 255):
+            point = decoder.parse_surface_point(i, 3, 5, (64, 0x21))
+            self.assertEqual(point[:2], tuple(c[i] for c in columns))
+            self.assertEqual(point[2:], (64, 1, 2))
+
+
+class ReadChunksTest(unittest.TestCase):
+    """Test reading whole chunks from a file."""
+
+    @staticmethod
+    def make_file(decoder, chunk_x=2, chunk_y=7):
+        """Build a 1.29 chunks file holding one chunk, by default at (2, 7)."""
+        data = bytes(range(256)) * ((decoder.blocks_size +
+                                     decoder.surface_size) // 256)
+        return io.BytesIO(
+            struct.pack('<8xi', 0) + struct.pack('<8xi', -1) * 64*1024 +
+            struct.pack('<QII', decoder.MAGIC, chunk_x, chunk_y) + data)
+
+    def test_read_chunks(self):
+        """Check read_chunks against the separate column readers."""
+        decoder = chunks.Chunks129Decoder()
+        chunksf = self.make_file(decoder)
+        chunk, = decoder.read_chunks(chunksf)
+        self.assertEqual((chunk.x, chunk.y), (2, 7))
+        self.assertEqual(chunk.blocks,
+                         next(decoder.read_block_columns(chunksf)))
+        self.assertEqual(chunk.surface,
+                         next(decoder.read_surface_columns(chunksf)))
+
+    def test_truncated_file(self):
+        """Check that a chunk cut short raises an error instead of decoding."""
+        decoder = chunks.Chunks129Decoder()
+        data = self.make_file(decoder).getvalue()
+        for size in (len(data) - 1, len(data) - decoder.surface_size - 1,
+                     decoder.directory_size + 20):
+            with self.subTest(size=size):
+                for read in (decoder.read_block_columns,
+                             decoder.read_surface_columns,
+                             decoder.read_chunks):
+                    with self.assertRaises(ValueError):
+                        list(read(io.BytesIO(data[:size])))
+
+    def test_custom_unpack_blocks(self):
+        """Check that the readers use an overridden unpack_blocks method."""
+        class CustomDecoder(chunks.Chunks129Decoder):
+            def unpack_blocks(self, data):
+                types, light, state = super().unpack_blocks(data)
+                return [-1] * len(types), light, state
+
+        decoder = CustomDecoder()
+        block = next(decoder.read_blocks(self.make_file(decoder)))
+        self.assertEqual(block.type, -1)
+
+    def test_large_chunk_position(self):
+        """Check coordinates of chunks far away from the origin."""
+        decoder = chunks.Chunks129Decoder()
+        for chunk_x in (2**27, 2**28 + 5, 2**32 - 1):
+            with self.subTest(chunk_x=chunk_x):
+                chunksf = self.make_file(decoder, chunk_x, 7)
+                blocks, = decoder.read_block_columns(chunksf)
+                self.assertEqual(blocks.x[0], chunk_x * 16)
+                self.assertEqual(blocks.x[-1], chunk_x * 16 + 15)
+                self.assertEqual(blocks.y[-1], 7 * 16 + 15)
+                surface, = decoder.read_surface_columns(chunksf)
+                self.assertEqual(surface.x[-1], chunk_x * 16 + 15)
+                block = next(decoder.read_blocks(chunksf))
+                self.assertEqual(block.x, chunk_x * 16)
+
+    def test_read_block_columns_index(self):
+        """Check that selecting blocks by index matches slicing columns."""
+        decoder = chunks.Chunks129Decoder()
+        chunksf = self.make_file(decoder)
+        columns, = decoder.read_block_columns(chunksf)
+        for index in (slice(5, None, 128), slice(127, None, 128), slice(0),
+                      slice(100, 200), [0, 130, 32767], []):
+            with self.subTest(index=index):
+                selected, = decoder.read_block_columns(chunksf, index=index)
+                if isinstance(index, slice):
+                    index = range(len(columns.x))[index]
+                self.assertEqual(
+                    [list(column) for column in selected],
+                    [[column[i] for i in index] for column in columns])
+
+
+class ContiguousRunsTest(unittest.TestCase):
+    """Test grouping of chunk offsets into sequential reads."""
+
+    def test_runs(self):
+        """Test that back-to-back chunks are merged in file order."""
+        decoder = chunks.Chunks129Decoder()
+        size, start = decoder.chunk_size, decoder.directory_size
+        offsets = [start + 3*size, start, start + size, start + 5*size]
+        self.assertEqual(list(decoder._contiguous_runs(offsets)),
+                         [(start, 2), (start + 3*size, 1),
+                          (start + 5*size, 1)])
+
+
 class DirectoryTest(unittest.TestCase):
     """Test the chunk directory parsers."""
 
-    # def test_directory_128(self):
-    #     """Test the chunk directory parser of the <=1.28 decoder."""
-    pass
+    @staticmethod
+    def make_directory(decoder, values):
+        """Build a directory holding values, padded with unused entries."""
+        entries = [(0, 0, v) for v in values]
+        invalid = decoder.INVALID_INDEX_VALUE
+        entries += [(invalid,) * 3] * (64*1024 + 1 - len(entries))
+        return io.BytesIO(b''.join(struct.pack('<3i', *e) for e in entries))
+
+    def test_directory_128(self):
+        """Test the chunk directory parser of the <=1.28 decoder."""
+        decoder = chunks.Chunks128Decoder()
+        offsets = [decoder.directory_size + decoder.chunk_size, 2**31 - 1]
+        directory = decoder.read_directory(
+            self.make_directory(decoder, offsets))
+        self.assertEqual(list(directory), offsets)
+
+    def test_directory_129(self):
+        """Test the chunk directory parser of the 1.29 decoder."""
+        decoder = chunks.Chunks129Decoder()
+        directory = decoder.read_directory(
+            self.make_directory(decoder, [2, 0, 65535]))
+        self.assertEqual(list(directory), [
+            decoder.directory_size + i*decoder.chunk_size
+            for i in (0, 2, 65535)
+        ])
 
 
 if __name__ == '__main__':
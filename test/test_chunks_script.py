@@ -19,6 +19,57 @@ class ArgumentTest(unittest.TestCase):
         args = chunks_script.handle_args([], ['-V', 'auto', 'surface'])
         self.assertEqual(args.file_version, 'auto')
 
+    def test_jobs(self):
+        """Test the -j/--jobs argument and its default."""
+        args = chunks_script.handle_args([], ['surface'])
+        self.assertEqual(args.jobs, 1)
+        args = chunks_script.handle_args([], ['-j', '4', 'surface'])
+        self.assertEqual(args.jobs, 4)
+        with self.assertRaises(SystemExit):
+            chunks_script.handle_args([], ['-j', 'many', 'surface'])
+        for jobs in ('0', '-1'):
+            with self.subTest(jobs=jobs), self.assertRaises(SystemExit):
+                chunks_script.handle_args([], ['-j', jobs, 'surface'])
+
+
+class PlaneTest(unittest.TestCase):
+    """Test selecting one plane of blocks with -p/--plane."""
+
+    def test_absolute_plane(self):
+        """Check the z coordinates of blocks in absolute planes."""
+        import io
+        import struct
+        decoder = chunks_script.Chunks129Decoder()
+        chunks_file = io.BytesIO(
+            struct.pack('<8xi', 0) + struct.pack('<8xi', -1) * 64*1024 +
+            struct.pack('<QII', decoder.MAGIC, 2, 7) +
+            bytes(decoder.blocks_size + decoder.surface_size))
+        for plane, z_coords in (('0', {0}), ('127', {127}), ('128', set()),
+                                (' -5', set()), ('-0', {0})):
+            with self.subTest(plane=plane):
+                columns = list(chunks_script.read_block_chunks(
+                    decoder, chunks_file, plane))
+                self.assertEqual({z for c in columns for z in c.z}, z_coords)
+
+
+class FormatTest(unittest.TestCase):
+    """Test the CSV formatting of decoded columns."""
+
+    def test_format_rows(self):
+        """Compare format_rows against the csv module's output."""
+        from array import array
+        from csv import QUOTE_NONNUMERIC, writer as csv_writer
+        from io import StringIO
+        batch = [(array('i', [-16, 0]), array('B', [0, 127])),
+                 (array('i', [2**31 - 1]), array('B', [255]))]
+        expected = StringIO()
+        for columns in batch:
+            csv_writer(expected, quoting=QUOTE_NONNUMERIC).writerows(
+                zip(*columns))
+        self.assertEqual(chunks_script.format_rows(batch),
+                         expected.getvalue())
+        self.assertEqual(chunks_script.format_rows([]), '')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,278 @@
+#!/usr/bin/python3
+
+"""Test the visualise module."""
+
+import random
+import unittest
+from array import array
+
+import visualise
+from visualise import HeatmapDataSet
+
+
+def random_points(count, values):
+    """Generate random points, some of them at the same position."""
+    rng = random.Random(count)
+    return [(rng.randint(-4, 6), rng.randint(-2, 5), rng.choice(values))
+            for _ in range(count)]
+
+
+def reference_pixels(points, colormap=None, min_value=None, max_value=None):
+    """Render points as RGBA pixels, looking up one pixel at a time.
+
+    This is how the color maps worked before they used a dense grid. The
+    default greyscale colormap is used if colormap is None.
+    """
+    xs, ys, values = zip(*points)
+    origin_x, origin_y = min(xs), min(ys)
+    width, height = max(xs) - origin_x, max(ys) - origin_y
+    low = min(values) if min_value is None else min_value
+    high = max(values) if max_value is None else max_value
+    by_coordinates = {}
+    for x, y, value in points:
+        value -= low
+        if colormap is None and high - low:
+            value /= high - low
+        by_coordinates[(x - origin_x, y - origin_y)] = value
+    pixels = []
+    for y in range(height):
+        for x in range(width):
+            if (x, y) not in by_coordinates:
+                pixels += [0, 0, 0, 0]
+            elif colormap is None:
+                pixels += [round(255 * by_coordinates[(x, y)])] * 3 + [255]
+            else:
+                pixels += colormap.colormap.get(by_coordinates[(x, y)],
+                                                colormap.default)
+    return bytes(pixels)
+
+
+def expand_greyscale(pixels):
+    """Convert greyscale pixels with alpha to RGBA pixels."""
+    rgba = bytearray(2 * len(pixels))
+    for channel in range(3):
+        rgba[channel::4] = pixels[0::2]
+    rgba[3::4] = pixels[1::2]
+    return bytes(rgba)
+
+
+class ColorTest(unittest.TestCase):
+    """Test parsing colors from color map files."""
+
+    def test_parse_html_color(self):
+        """Test all supported color formats."""
+        parse = visualise.ColorMap._parse_html_color
+        self.assertEqual(parse('#abc'), (0xAA, 0xBB, 0xCC, 0xFF))
+        self.assertEqual(parse('abc8'), (0xAA, 0xBB, 0xCC, 0x88))
+        self.assertEqual(parse('#a1B2c3'), (0xA1, 0xB2, 0xC3, 0xFF))
+        self.assertEqual(parse('a1b2c3d4'), (0xA1, 0xB2, 0xC3, 0xD4))
+        self.assertEqual(parse('#0000'), (0, 0, 0, 0))
+        for color in ('', '#12', '12345', '#1234567', 'fffffffff'):
+            with self.subTest(color=color), self.assertRaises(ValueError):
+                parse(color)
+
+
+class HeatmapDataSetTest(unittest.TestCase):
+    """Test the storage and transformation of heatmap data."""
+
+    def test_columns(self):
+        """Check the columns and bounds of a data set."""
+        dataset = HeatmapDataSet([(3, -2, 1), (0, 4, 8), (-1, 0, 3)])
+        for column in (dataset.xs, dataset.ys, dataset.values):
+            self.assertIsInstance(column, array)
+            self.assertEqual(len(column), 3)
+        self.assertEqual(dataset.bounds, (-1, -2, 4, 6, 1, 8))
+
+    def test_relative_coordinates(self):
+        """Check that coordinates are stored relative to the origin."""
+        dataset = HeatmapDataSet([(3, -2, 1), (0, 4, 8), (-1, 0, 3)])
+        self.assertEqual(list(dataset.xs), [4, 1, 0])
+        self.assertEqual(list(dataset.ys), [0, 6, 2])
+        self.assertEqual(dataset.bounds[:2], (-1, -2))
+        self.assertEqual(list(dataset.data_transform()),
+                         [(4, 0, 0), (1, 6, 7), (0, 2, 2)])
+
+    def test_from_columns(self):
+        """Compare from_columns against the constructor."""
+        points = [(3, -2, 1), (0, 4, 8), (-1, 0, 3)]
+        by_points = HeatmapDataSet(points, min_value=0)
+        by_columns = HeatmapDataSet.from_columns(*map(iter, zip(*points)),
+                                                 min_value=0)
+        self.assertEqual(by_points.bounds, by_columns.bounds)
+        self.assertEqual(list(by_points.data_transform(relative=True)),
+                         list(by_columns.data_transform(relative=True)))
+
+    def test_bounds_range(self):
+        """Check that the value range is derived from the bounds."""
+        bounds = HeatmapDataSet([(0, 0, -3), (2, 1, 4)]).bounds
+        self.assertEqual(bounds.range, 7)
+        self.assertEqual(bounds._replace(max=10).range, 13)
+        self.assertEqual(len(bounds), 6)
+
+    def test_given_bounds(self):
+        """Check that given value bounds replace the data's extrema."""
+        points = [(0, 0, 2), (1, 1, 4)]
+        bounds = HeatmapDataSet(points, min_value=0, max_value=10).bounds
+        self.assertEqual((bounds.min, bounds.max), (0, 10))
+        bounds = HeatmapDataSet(points, min_value=1).bounds
+        self.assertEqual((bounds.min, bounds.max), (1, 4))
+        bounds = HeatmapDataSet(points, max_value=9).bounds
+        self.assertEqual((bounds.min, bounds.max), (2, 9))
+
+    def test_float_values(self):
+        """Check that non-integer values are stored and scaled as floats."""
+        dataset = HeatmapDataSet([(0, 0, 1), (1, 1, 0.5), (2, 0, 3)])
+        self.assertEqual(dataset.values.typecode, 'd')
+        self.assertEqual(list(dataset.values), [1, 0.5, 3])
+        self.assertEqual([point.value for point in
+                          dataset.data_transform(relative=True)],
+                         [0.2, 0, 1])
+
+    def test_column_types(self):
+        """Check the array types chosen for the columns."""
+        dataset = HeatmapDataSet([(0, 0, 1), (2**40, 1, -2)])
+        self.assertEqual(dataset.xs.typecode, 'q')
+        self.assertEqual(dataset.ys.typecode, 'i')
+        self.assertEqual(dataset.values.typecode, 'i')
+        dataset = HeatmapDataSet([(0, 0, 1), (1, 1, 2**40)])
+        self.assertEqual(dataset.values.typecode, 'q')
+        for values in ([1, 2**64 + 1], [0.5, 2**60 + 1]):
+            with self.subTest(values=values), \
+                    self.assertRaises(OverflowError):
+                HeatmapDataSet.from_columns([0, 1], [0, 1], values)
+        with self.assertRaises(OverflowError):
+            HeatmapDataSet([(0, 0, 1), (2**64, 1, 1)])
+
+    def test_duplicate_points(self):
+        """Check that the last point at a position is kept."""
+        dataset = HeatmapDataSet([(1, 1, 5), (2, 3, 7), (1, 1, 9), (1, 1, 6)])
+        self.assertEqual(sorted(dataset.data_transform()),
+                         [(0, 0, 1), (1, 2, 2)])
+        # The values of dropped points still count towards the bounds.
+        self.assertEqual(dataset.bounds, (1, 1, 1, 2, 5, 9))
+
+    def test_dense(self):
+        """Check the layout of the dense grid."""
+        dataset = HeatmapDataSet([(0, 0, 2), (1, 1, 4), (2, 0, 3), (2, 2, 6)])
+        values, mask = dataset.dense()
+        self.assertEqual(values, [0, None, None, 2])
+        self.assertEqual(mask, bytearray([1, 0, 0, 1]))
+        relative, _ = dataset.dense(relative=True)
+        self.assertEqual(relative, [0, None, None, 0.5])
+
+    def test_dense_edges(self):
+        """Check that points on the maximum x coordinate do not wrap."""
+        dataset = HeatmapDataSet([(0, 0, 1), (2, 0, 5), (2, 1, 6), (0, 3, 1)])
+        values, mask = dataset.dense()
+        self.assertEqual(values, [0, None] + [None, None] * 2)
+        self.assertEqual(mask, bytearray([1, 0, 0, 0, 0, 0]))
+
+    def test_dense_cached(self):
+        """Check that the dense grid is only laid out once."""
+        dataset = HeatmapDataSet([(0, 0, 2), (1, 1, 4), (2, 2, 6)])
+        values, mask = dataset.dense()
+        self.assertIs(dataset.dense()[0], values)
+        self.assertIs(dataset.dense()[1], mask)
+        relative, _ = dataset.dense(relative=True)
+        self.assertIsNot(relative, values)
+        self.assertIs(dataset.dense(relative=True)[0], relative)
+
+
+class DefaultColorMapTest(unittest.TestCase):
+    """Compare the default color map against reference_pixels."""
+
+    def check_pixels(self, points, **bounds):
+        """Render points and compare the result with reference_pixels."""
+        dataset = HeatmapDataSet(points, **bounds)
+        pixels = visualise.DefaultColorMap().heatmap_pixels(dataset)
+        self.assertEqual(expand_greyscale(pixels),
+                         reference_pixels(points, **bounds))
+
+    def test_random_points(self):
+        """Compare rendering of random points."""
+        for count in (1, 2, 10, 50, 200):
+            with self.subTest(count=count):
+                self.check_pixels(random_points(count, range(-3, 9)))
+
+    def test_given_bounds(self):
+        """Compare rendering with the value bounds given explicitly."""
+        points = random_points(40, range(0, 6))
+        self.check_pixels(points, min_value=0, max_value=10)
+        self.check_pixels(points, min_value=-2)
+
+    def test_single_value(self):
+        """Compare rendering points that all hold the same value."""
+        for count in (1, 2, 30):
+            with self.subTest(count=count):
+                self.check_pixels(random_points(count, [4]))
+        self.check_pixels(random_points(20, [5]), min_value=5, max_value=5)
+        # The values differ, so the range is only zero because it is given.
+        self.check_pixels(random_points(20, [5, 6]), min_value=5,
+                          max_value=5)
+
+    def test_greyscale(self):
+        """Check that two bytes are generated per pixel."""
+        colormap = visualise.DefaultColorMap()
+        self.assertTrue(colormap.greyscale)
+        dataset = HeatmapDataSet(random_points(50, range(3)))
+        self.assertEqual(len(colormap.heatmap_pixels(dataset)),
+                         2 * dataset.bounds.width * dataset.bounds.height)
+        self.assertFalse(visualise.AbsoluteColorMap({}).greyscale)
+
+
+class AbsoluteColorMapTest(unittest.TestCase):
+    """Compare the absolute color map against reference_pixels."""
+
+    COLORS = {'default': '#123', '0': '#fff', '2': '#a0b0c0', '5': '#1234'}
+
+    def check_pixels(self, points, **bounds):
+        """Render points and compare the result with reference_pixels."""
+        colormap = visualise.AbsoluteColorMap(self.COLORS)
+        dataset = HeatmapDataSet(points, **bounds)
+        self.assertEqual(colormap.heatmap_pixels(dataset),
+                         reference_pixels(points, colormap, **bounds))
+
+    def test_random_points(self):
+        """Compare rendering of random points."""
+        for count in (1, 2, 10, 50, 200):
+            with self.subTest(count=count):
+                self.check_pixels(random_points(count, range(-3, 9)))
+
+    def test_given_bounds(self):
+        """Compare rendering with the value bounds given explicitly."""
+        points = random_points(40, range(0, 6))
+        self.check_pixels(points, min_value=0, max_value=10)
+        self.check_pixels(points, min_value=-2)
+
+
+class ColorMapTest(unittest.TestCase):
+    """Test the methods color maps share."""
+
+    def test_list_rows(self):
+        """Check heatmap_pixels for a color map yielding lists as rows."""
+        class ListColorMap(visualise.ColorMap):
+            def color_heatmap(self, dataset):
+                return [[0, 1, 2, 3], [255] * 4, []]
+
+        dataset = HeatmapDataSet([(0, 0, 1)])
+        self.assertEqual(ListColorMap().heatmap_pixels(dataset),
+                         bytes([0, 1, 2, 3] + [255] * 4))
+
+    def test_rows(self):
+        """Check that color_heatmap splits heatmap_pixels into rows."""
+        dataset = HeatmapDataSet(random_points(50, range(-3, 9)))
+        width, height = dataset.bounds.width, dataset.bounds.height
+        for colormap in (visualise.DefaultColorMap(),
+                         visualise.AbsoluteColorMap({'3': '#abc'})):
+            with self.subTest(colormap=colormap):
+                rows = list(colormap.color_heatmap(dataset))
+                self.assertEqual(len(rows), height)
+                pixel_size = 2 if colormap.greyscale else 4
+                for row in rows:
+                    self.assertEqual(len(row), pixel_size * width)
+                self.assertEqual(b''.join(rows),
+                                 colormap.heatmap_pixels(dataset))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,8 +7,9 @@ format.
 """
 
 from abc import ABCMeta, abstractmethod
-from array import array
-from itertools import chain
+from collections import deque
+from itertools import compress, repeat
+from operator import add, and_, lt, mul
 
 
 class ColorMap(metaclass=ABCMeta):
@@ -18,6 +19,10 @@ class ColorMap(metaclass=ABCMeta):
     color_heatmap(self, dataset) method.
     """
 
+    # Whether the pixels generated hold a grey level and alpha value each,
+    # rather than RGBA. Pass this as the greyscale argument to png.Writer.
+    greyscale = False
+
     @staticmethod
     def _parse_html_color(color):
         r"""Parse a color conforming to the regex #?\d\d?\d\d?\d\d?\d?\d?.
@@ -26,12 +31,54 @@ class ColorMap(metaclass=ABCMeta):
         optional hash ("#") character in front:
             ["#RRGGBB", "#RGB", "#RRGGBBAA", "#RGBA"].
         """
-        color = color.translate({ord('#'): None})
-        cl = len(color) // 3  # len of one RGBA component
-        r, g, b, a = color[:cl], color[cl:2*cl], color[2*cl:3*cl], color[3*cl:]
-        if cl == 1:
-            r, g, b, a = map(lambda c: 2*c, (r, g, b, a))
-        return int(r, 16), int(g, 16), int(b, 16), int(a, 16) if a else 255
+        color = color.replace('#', '')
+        digits, value = len(color), int(color, 16)
+        if digits == 3 or digits == 6:
+            # Without an alpha component, the color is opaque.
+            bits = 4 * digits // 3
+            value = value << bits | (1 << bits) - 1
+            digits += digits // 3
+        if digits == 4:
+            # Each component is one hex digit, which is repeated.
+            return tuple((value >> shift & 0xF) * 0x11
+                         for shift in (12, 8, 4, 0))
+        if digits == 8:
+            return tuple(value >> shift & 0xFF for shift in (24, 16, 8, 0))
+        raise ValueError('invalid HTML color: {}'.format(color))
+
+    @staticmethod
+    def _render_pixels(values, colors, default):
+        """Return the pixels for a grid of values as one bytes object.
+
+        values is a flat grid as returned by HeatmapDataSet.dense, holding
+        None for pixels without data. colors maps values to the bytes of one
+        pixel each, and must map None to the color for pixels without data.
+        Values missing from colors are drawn in the default color. The whole
+        image is assembled by C-level calls alone, without per-pixel Python
+        code.
+        """
+        return b''.join(map(colors.get, values, repeat(default)))
+
+    def _split_rows(self, pixels, bounds):
+        """Generate the pixel rows of a flat image.
+
+        The rows are memoryviews into pixels, so no row is copied.
+        """
+        stride = (2 if self.greyscale else 4) * bounds.width
+        pixels = memoryview(pixels)
+        for y in range(bounds.height):
+            yield pixels[y*stride:(y+1)*stride]
+
+    def heatmap_pixels(self, dataset):
+        """Transform heatmap data into one flat sequence of pixel values.
+
+        Each pixel is RGBA, or a grey level and alpha if self.greyscale is
+        true. The result can be passed to a png.Writer's write_array method,
+        which avoids handling each row separately. By default, this joins the
+        rows generated by color_heatmap, which may be any sequences of ints
+        that png.Writer.write accepts.
+        """
+        return b''.join(map(bytes, self.color_heatmap(dataset)))
 
     @abstractmethod
     def color_heatmap(self, dataset):
@@ -47,27 +94,61 @@ class AbsoluteColorMap(ColorMap):
         self.default = self._parse_html_color(colors.get('default', '#0000'))
         self.colormap = {int(k): self._parse_html_color(c)
                          for k, c in colors.items() if k.isdigit()}
+        # The pixels for each value, ready to be joined into rows.
+        self._pixels = {value: bytes(color)
+                        for value, color in self.colormap.items()}
+        self._pixels[None] = bytes(4)
+        self._default_pixel = bytes(self.default)
+
+    def heatmap_pixels(self, dataset):
+        """Transform heatmap data into one flat sequence of RGBA values."""
+        values, _ = dataset.dense(relative=False)
+        return self._render_pixels(values, self._pixels, self._default_pixel)
 
     def color_heatmap(self, dataset):
         """Transform heatmap data into pixel rows to write to a PNG file."""
-        coord_data = dataset.by_coordinates(relative=False)
-        for y in range(dataset.bounds.height):
-            yield array('B', chain.from_iterable(
-                self.colormap.get(coord_data[(x, y)], self.default)
-                if (x, y) in coord_data else (0, 0, 0, 0)
-                for x in range(dataset.bounds.width)
-            ))
+        return self._split_rows(self.heatmap_pixels(dataset), dataset.bounds)
 
 
 class DefaultColorMap(ColorMap):
-    """The default greyscale colormap to use if no user-provided one exists."""
+    """The default greyscale colormap to use if no user-provided one exists.
+
+    As all of its colors are grey, it generates greyscale pixels with alpha,
+    which are half the size of RGBA pixels.
+    """
+
+    greyscale = True
+
+    def heatmap_pixels(self, dataset):
+        """Transform heatmap data into one flat sequence of pixel values.
+
+        If all values are equal to the minimum, as is the case when the
+        data holds a single value, every point is black. Then, only the
+        alpha values need filling in, which is done straight from the
+        points' coordinates, without laying out a dense grid.
+        """
+        bounds, data_values = dataset.bounds, dataset.values
+        if (not bounds.range and
+                data_values.count(bounds.min) == len(data_values)):
+            width, height = bounds.width, bounds.height
+            # Points on the maximum x or y coordinate are left out, as in
+            # HeatmapDataSet.dense.
+            inside = map(and_, map(lt, dataset.xs, repeat(width)),
+                         map(lt, dataset.ys, repeat(height)))
+            positions = map(add, map(mul, dataset.ys, repeat(width)),
+                            dataset.xs)
+            alpha = bytearray(width * height)
+            deque(map(alpha.__setitem__, compress(positions, inside),
+                      repeat(255)), maxlen=0)
+            pixels = bytearray(2 * len(alpha))
+            pixels[1::2] = alpha
+            return bytes(pixels)
+        values, _ = dataset.dense(relative=True)
+        colors = {value: bytes((round(255 * value), 255))
+                  for value in set(values) if value is not None}
+        colors[None] = bytes(2)
+        return self._render_pixels(values, colors, None)
 
     def color_heatmap(self, dataset):
         """Transform heatmap data into pixel rows to write to a PNG file."""
-        coord_data = dataset.by_coordinates(relative=True)
-        for y in range(dataset.bounds.height):
-            yield array('B', map(round, chain.from_iterable(
-                (*((255 * coord_data[(x, y)],) * 3), 255)
-                if (x, y) in coord_data else (0, 0, 0, 0)
-                for x in range(dataset.bounds.width)
-            )))
+        return self._split_rows(self.heatmap_pixels(dataset), dataset.bounds)
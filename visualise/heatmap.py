@@ -3,47 +3,182 @@
 """Visualise three-dimensional integer data using heatmaps.
 
 To create a heatmap, pass data formatted as HeatmapPoints (at most one for each
-(x, y) coordinate of the heatmap, any more will be ignored) to the
-HeatmapDataSet constructor. Pass the heatmap through a ColorMap subclass's
-color_heatmap method to generate PNG data that can be passed to a png.Writer.
+(x, y) coordinate of the heatmap; of any more, only the last is drawn) to the
+HeatmapDataSet constructor, or the x and y coordinates and values as separate
+sequences to HeatmapDataSet.from_columns. Pass the heatmap through a ColorMap
+subclass's color_heatmap method to generate PNG data that can be passed to a
+png.Writer, or through its heatmap_pixels method for the writer's write_array
+method. Color maps look up pixels on the dense grid from HeatmapDataSet.dense.
 """
 
+from array import array
 from collections import namedtuple
+from itertools import chain, repeat
+from operator import add, is_not, mul, sub, truediv
 
 
 HeatmapPoint = namedtuple('HeatmapPoint', 'x y value')
-Bounds = namedtuple('Bounds', 'x y width height min max range')
+
+
+class Bounds(namedtuple('Bounds', 'x y width height min max')):
+    """The extent of a heatmap's coordinates and values."""
+
+    __slots__ = ()
+
+    @property
+    def range(self):
+        """The difference between the largest and smallest value."""
+        return self.max - self.min
+
+
+def _column_array(column, typecodes):
+    """Return an array holding the items of column.
+
+    The array has the first of the given typecodes whose items can hold
+    every item of column. If there is none, the error from the last typecode
+    tried is raised. Integer items must be stored exactly: if a float
+    typecode is reached and an integer item would be rounded there, e.g.
+    because it is above 2**63, OverflowError is raised instead.
+    """
+    if not isinstance(column, (array, list, tuple)):
+        column = list(column)
+    for typecode in typecodes:
+        try:
+            result = array(typecode, column)
+        except (OverflowError, TypeError) as error:
+            last_error = error
+            continue
+        if typecode in 'fd':
+            for item, stored in zip(column, result):
+                if isinstance(item, int) and item != stored:
+                    raise OverflowError('integer {} cannot be stored exactly '
+                                        'in a heatmap'.format(item))
+        return result
+    raise last_error
+
+
+def _min_max(column):
+    """Return the smallest and largest item of column.
+
+    Both are found in a single pass, which is quicker than calling min and
+    max, as each of those passes over the column and boxes every item.
+    """
+    smallest = largest = column[0]
+    for item in column:
+        if item < smallest:
+            smallest = item
+        elif item > largest:
+            largest = item
+    return smallest, largest
 
 
 class HeatmapDataSet:
     """Hold heatmap data and normalise it on request."""
 
     def __init__(self, points, min_value=None, max_value=None):
-        """Initialise a new heatmap's data."""
-        points = tuple(points)
-        x = min(pt.x for pt in points)
-        y = min(pt.y for pt in points)
-        w = max(pt.x for pt in points) - x
-        h = max(pt.y for pt in points) - y
-        min_val = (min(pt.value for pt in points)
-                   if min_value is None else min_value)
-        max_val = (max(pt.value for pt in points)
-                   if max_value is None else max_value)
-        self.bounds = Bounds(x, y, w, h, min_val, max_val, max_val - min_val)
-        self.points = [HeatmapPoint(x, y, value) for x, y, value in points]
+        """Initialise a new heatmap's data.
+
+        The points are stored as three arrays holding their x and y
+        coordinates and values, rather than as one object per point.
+        """
+        xs, ys, values = zip(*points)
+        self._set_columns(xs, ys, values, min_value, max_value)
+
+    @classmethod
+    def from_columns(cls, xs, ys, values, min_value=None, max_value=None):
+        """Create a heatmap from separate x, y and value sequences.
+
+        This is equivalent to HeatmapDataSet(zip(xs, ys, values), ...), but
+        does not group the data into points only to split it up again.
+        """
+        dataset = cls.__new__(cls)
+        dataset._set_columns(xs, ys, values, min_value, max_value)
+        return dataset
+
+    def _set_columns(self, xs, ys, values, min_value, max_value):
+        """Store the heatmap's columns and calculate its bounds.
+
+        Coordinates are stored relative to the origin (bounds.x, bounds.y),
+        as 32-bit integers, or 64-bit ones if they do not fit. Values are
+        too, unless any of them is not an integer, in which case they are
+        stored as double-precision floats. The narrower the arrays, the less
+        memory every pass over them has to read. Integers that cannot be
+        stored exactly raise OverflowError.
+        """
+        self.xs = _column_array(xs, 'iq')
+        self.ys = _column_array(ys, 'iq')
+        self.values = _column_array(values, 'iqd')
+        if not len(self.xs) == len(self.ys) == len(self.values):
+            raise ValueError('heatmap columns differ in length')
+        min_x, max_x = _min_max(self.xs)
+        min_y, max_y = _min_max(self.ys)
+        # The values need not be scanned if both their bounds are given.
+        if min_value is None or max_value is None:
+            data_min, data_max = _min_max(self.values)
+            if min_value is None:
+                min_value = data_min
+            if max_value is None:
+                max_value = data_max
+        self.bounds = Bounds(min_x, min_y, max_x - min_x, max_y - min_y,
+                             min_value, max_value)
+        # Only the last point at each position is drawn, so the others are
+        # dropped here, once. Their values still count towards the bounds.
+        last_index = dict(zip(zip(self.xs, self.ys), range(len(self.xs))))
+        if len(last_index) < len(self.xs):
+            keep = sorted(last_index.values())
+            self.xs, self.ys, self.values = (
+                array(column.typecode, map(column.__getitem__, keep))
+                for column in (self.xs, self.ys, self.values))
+        # Make the coordinates relative to the heatmap's origin once, rather
+        # than every time the data is transformed.
+        if min_x:
+            self.xs = _column_array(map(sub, self.xs, repeat(min_x)), 'iq')
+        if min_y:
+            self.ys = _column_array(map(sub, self.ys, repeat(min_y)), 'iq')
+        # Dense grids already laid out, by their relative argument.
+        self._dense_grids = {}
+
+    def _normalised_values(self, relative):
+        """Return an iterator over the values, as normalised for output."""
+        values = map(sub, self.values, repeat(self.bounds.min))
+        if relative and self.bounds.range:
+            values = map(truediv, values, repeat(self.bounds.range))
+        return values
 
     def data_transform(self, *, relative=False):
         """Generate normalised data."""
-        for x, y, value in self.points:
-            value -= self.bounds.min
-            if relative and self.bounds.range:
-                value /= self.bounds.range
-            yield HeatmapPoint(x - self.bounds.x, y - self.bounds.y, value)
+        return map(HeatmapPoint, self.xs, self.ys,
+                   self._normalised_values(relative))
+
+    def dense(self, *, relative=False):
+        """Lay heatmap data out on a dense grid.
+
+        Return a tuple (values, mask) of flat sequences with an item for each
+        pixel of the heatmap, row by row. Where mask is 0, there is no data
+        for the pixel and values holds None. Points on the maximum x or y
+        coordinate lie outside the heatmap's bounds and are left out. The
+        values are normalised as by self.data_transform.
 
-    def by_coordinates(self, **transforms):
-        """Index heatmap data by coordinates.
+        The grid is filled by C-level calls alone: points are indexed by
+        their position in a grid with one extra column, so that points on
+        the maximum x coordinate do not wrap around into the next row, and
+        the heatmap's pixels are then looked up in that index.
 
-        Any keyword arguments are passed unchanged to self.data_transform.
+        The grid is only laid out once for each value of relative, so that
+        drawing the same heatmap again is cheap. The returned sequences are
+        shared between calls and must not be modified, nor may the data
+        set's columns.
         """
-        data = self.data_transform(**transforms)
-        return {(x, y): value for x, y, value in data}
+        try:
+            return self._dense_grids[relative]
+        except KeyError:
+            pass
+        width, height = self.bounds.width, self.bounds.height
+        stride = width + 1
+        positions = map(add, map(mul, self.ys, repeat(stride)), self.xs)
+        by_position = dict(zip(positions, self._normalised_values(relative)))
+        rows = (range(y*stride, y*stride + width) for y in range(height))
+        values = list(map(by_position.get, chain.from_iterable(rows)))
+        mask = bytearray(map(is_not, values, repeat(None)))
+        self._dense_grids[relative] = values, mask
+        return values, mask